@@ -4,7 +4,7 @@ Configuration for TennisMyLife data source (stats.tennismylife.org).
 
 # Data source
 TENNISMYLIFE_BASE_URL = "https://stats.tennismylife.org/data"
-TENNISMYLIFE_YEARS = [2024, 2025, 2026]
+TENNISMYLIFE_YEARS = (2024, 2025, 2026)  # tuple: shared default, must not be mutated
 
 # Year CSVs: completed tournaments for that year
 def get_tennismylife_year_url(year: int) -> str:
@@ -10,6 +10,7 @@ import json
 import os
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import joblib
 from fastapi import FastAPI, HTTPException
@@ -23,6 +24,39 @@ MODEL_PATH = OUTPUTS / "model.pkl"
 FEATURE_COLS_PATH = OUTPUTS / "feature_cols.json"
 PLAYER_STATS_PATH = OUTPUTS / "player_stats_latest.csv"
 
+_NOT_READY_DETAIL = (
+    "Model not ready. Run the pipeline and commit outputs/ to the repo, then redeploy."
+)
+
+# Last 5 results columns in player_stats_latest.csv, most recent first
+_LAST5_COLS = [f"last5_{i}" for i in range(1, 6)]
+# Per-player stats shown in the scorecard (besides ELO); also model inputs as A - B diffs
+_PLAYER_STAT_COLS = (
+    "rolling_win_pct",
+    "last3_win_avg",
+    "surface_win_pct",
+    "rolling_ace_avg",
+    "rolling_minutes_avg",
+    "rolling_bp_save",
+)
+# Model diff feature -> player_stats column it is computed from (same as pipelines/train_model.py)
+_DIFF_FEATURES = {
+    "elo_diff": "elo_before",
+    "form_diff": "rolling_win_pct",
+    "last3_win_diff": "last3_win_avg",
+    "surface_win_diff": "surface_win_pct",
+    "ace_diff": "rolling_ace_avg",
+    "minutes_diff": "rolling_minutes_avg",
+    "bp_diff": "rolling_bp_save",
+}
+_DIFF_INPUT_COLS = list(_DIFF_FEATURES.values())
+# Surface dummies per surface (train used drop_first => Clay is reference)
+_SURFACE_DUMMIES = {
+    "Hard": {"surface_Grass": 0.0, "surface_Hard": 1.0},
+    "Clay": {"surface_Grass": 0.0, "surface_Hard": 0.0},
+    "Grass": {"surface_Grass": 1.0, "surface_Hard": 0.0},
+}
+
 app = FastAPI(title="Breakpoint Analytics API", version="0.1.0")
 
 # Allow GitHub Pages and localhost. Set ALLOWED_ORIGINS env on Render to restrict.
@@ -40,6 +74,10 @@ _model = None
 _feature_cols = None
 _player_stats = None
 _load_error = None
+# Per-player model inputs + response fields; player stats never change after load
+_player_cache = {}
+# /players payload, built once on first request
+_players_list = None
 
 
 def _load_artifacts():
@@ -57,13 +95,15 @@ def _load_artifacts():
         _model = joblib.load(MODEL_PATH)
         with open(FEATURE_COLS_PATH) as f:
             _feature_cols = json.load(f)
-        _player_stats = pd.read_csv(PLAYER_STATS_PATH)
-        _player_stats["date"] = pd.to_datetime(_player_stats["date"])
+        _player_stats = pd.read_csv(PLAYER_STATS_PATH, parse_dates=["date"])
+        # Indexed by player so /predict resolves both players with hash lookups.
         _player_stats = (
             _player_stats.sort_values("date")
-            .groupby("player", as_index=False)
+            .groupby("player")
             .last()
         )
+        # Fixed after load, so format once (NaT -> NaN) instead of on every request.
+        _player_stats["last_played"] = _player_stats["date"].dt.strftime("%Y-%m-%d")
     except Exception as e:
         _load_error = e
         raise
@@ -74,16 +114,54 @@ def health():
     return {"status": "ok"}
 
 
-def _format_last_played(date_ser):
-    """Format date for JSON (YYYY-MM-DD); None if missing/invalid."""
-    if date_ser is None or (hasattr(date_ser, "item") and pd.isna(date_ser)):
+def _last_played(day):
+    """Preformatted last_played (YYYY-MM-DD) for JSON; None if missing/invalid."""
+    return day if isinstance(day, str) else None
+
+
+def _model_inputs(s):
+    """Model input stats (in _DIFF_FEATURES order) as floats; 0.0 if missing/blank."""
+    # One reindex + coercion instead of a .get/notna/float per key.
+    vals = pd.to_numeric(s.reindex(_DIFF_INPUT_COLS), errors="coerce")
+    return vals.fillna(0.0).to_numpy(dtype=np.float64)
+
+
+def _stat(s, key):
+    """Stat rounded to 4 dp for the JSON response; None if missing/invalid."""
+    v = s.get(key)
+    if pd.isna(v) or v == "":
         return None
     try:
-        return pd.Timestamp(date_ser).strftime("%Y-%m-%d")
+        return round(float(v), 4)
     except (TypeError, ValueError):
         return None
 
 
+def _last5(s):
+    """Last 5 results (1=win, 0=loss, None=no match), most recent first."""
+    # CSV may have 0.0/1.0 (float) or "0"/"1" (str); coerce all five slots in one pass.
+    vals = pd.to_numeric(s.reindex(_LAST5_COLS), errors="coerce")
+    return [None if pd.isna(v) else int(v) for v in vals]
+
+
+def _player_profile(name):
+    """Model inputs, scorecard stats, last 5 and last_played for one player (cached)."""
+    profile = _player_cache.get(name)
+    if profile is None:
+        s = _player_stats.loc[name]
+        profile = {
+            "inputs": _model_inputs(s),
+            "stats": {
+                "elo": _stat(s, "current_elo") or _stat(s, "elo_before"),
+                **{key: _stat(s, key) for key in _PLAYER_STAT_COLS},
+            },
+            "last5": _last5(s),
+            "last_played": _last_played(s.get("last_played")),
+        }
+        _player_cache[name] = profile
+    return profile
+
+
 @app.get("/players")
 def players():
     try:
@@ -91,16 +169,16 @@ def players():
     except FileNotFoundError as e:
         raise HTTPException(
             status_code=503,
-            detail="Model not ready. Run the pipeline and commit outputs/ to the repo, then redeploy.",
+            detail=_NOT_READY_DETAIL,
         ) from e
-    out = []
-    for _, row in _player_stats.iterrows():
-        out.append({
-            "name": str(row["player"]),
-            "last_played": _format_last_played(row.get("date")),
-        })
-    out.sort(key=lambda x: x["name"])
-    return {"players": out}
+    global _players_list
+    if _players_list is None:
+        stats = _player_stats.sort_index()
+        _players_list = [
+            {"name": str(name), "last_played": _last_played(day)}
+            for name, day in zip(stats.index, stats["last_played"])
+        ]
+    return {"players": _players_list}
 
 
 class PredictRequest(BaseModel):
@@ -116,113 +194,42 @@ def predict(req: PredictRequest):
     except FileNotFoundError as e:
         raise HTTPException(
             status_code=503,
-            detail="Model not ready. Run the pipeline and commit outputs/ to the repo, then redeploy.",
+            detail=_NOT_READY_DETAIL,
         ) from e
     a = req.player_a.strip()
     b = req.player_b.strip()
     if a == b:
         raise HTTPException(status_code=400, detail="Choose two different players")
     surface = req.surface.strip().capitalize()
-    if surface not in ("Hard", "Clay", "Grass"):
+    if surface not in _SURFACE_DUMMIES:
         raise HTTPException(status_code=400, detail="surface must be Hard, Clay, or Grass")
 
     stats = _player_stats
-    row_a = stats[stats["player"] == a]
-    row_b = stats[stats["player"] == b]
-    if row_a.empty:
+    if a not in stats.index:
         raise HTTPException(status_code=404, detail=f"Player not found: {a}")
-    if row_b.empty:
+    if b not in stats.index:
         raise HTTPException(status_code=404, detail=f"Player not found: {b}")
-    sa = row_a.iloc[0]
-    sb = row_b.iloc[0]
-
-    def _f(s, key, default=0.0):
-        v = s.get(key)
-        return float(v) if pd.notna(v) and v != "" else default
-
-    # Diffs: A - B (positive => A stronger on that feature)
-    rank_diff = 0.0  # not in player_stats; use 0
-    elo_diff = _f(sa, "elo_before") - _f(sb, "elo_before")
-    form_diff = _f(sa, "rolling_win_pct") - _f(sb, "rolling_win_pct")
-    last3_win_diff = _f(sa, "last3_win_avg") - _f(sb, "last3_win_avg")
-    surface_win_diff = _f(sa, "surface_win_pct") - _f(sb, "surface_win_pct")
-    ace_diff = _f(sa, "rolling_ace_avg") - _f(sb, "rolling_ace_avg")
-    minutes_diff = _f(sa, "rolling_minutes_avg") - _f(sb, "rolling_minutes_avg")
-    bp_diff = _f(sa, "rolling_bp_save") - _f(sb, "rolling_bp_save")
-
-    # Surface dummies (train used drop_first => Clay is reference)
-    surface_Grass = 1.0 if surface == "Grass" else 0.0
-    surface_Hard = 1.0 if surface == "Hard" else 0.0
+    pa = _player_profile(a)
+    pb = _player_profile(b)
+
+    # Diffs: A - B (positive => A stronger on that feature), one vector subtraction
+    diffs = pa["inputs"] - pb["inputs"]
 
     row = {
-        "rank_diff": rank_diff,
-        "elo_diff": elo_diff,
-        "form_diff": form_diff,
-        "last3_win_diff": last3_win_diff,
-        "surface_win_diff": surface_win_diff,
-        "ace_diff": ace_diff,
-        "minutes_diff": minutes_diff,
-        "bp_diff": bp_diff,
-        "surface_Grass": surface_Grass,
-        "surface_Hard": surface_Hard,
+        "rank_diff": 0.0,  # not in player_stats; use 0
+        **dict(zip(_DIFF_FEATURES, diffs.tolist())),
+        **_SURFACE_DUMMIES[surface],
     }
     X = pd.DataFrame([row])[_feature_cols]
     prob_a_wins = float(_model.predict_proba(X)[0, 1])
 
-    def _stat(s, key):
-        v = s.get(key)
-        if pd.isna(v) or v == "":
-            return None
-        try:
-            return round(float(v), 4)
-        except (TypeError, ValueError):
-            return None
-
-    stats_a = {
-        "elo": _stat(sa, "current_elo") or _stat(sa, "elo_before"),
-        "rolling_win_pct": _stat(sa, "rolling_win_pct"),
-        "last3_win_avg": _stat(sa, "last3_win_avg"),
-        "surface_win_pct": _stat(sa, "surface_win_pct"),
-        "rolling_ace_avg": _stat(sa, "rolling_ace_avg"),
-        "rolling_minutes_avg": _stat(sa, "rolling_minutes_avg"),
-        "rolling_bp_save": _stat(sa, "rolling_bp_save"),
-    }
-    stats_b = {
-        "elo": _stat(sb, "current_elo") or _stat(sb, "elo_before"),
-        "rolling_win_pct": _stat(sb, "rolling_win_pct"),
-        "last3_win_avg": _stat(sb, "last3_win_avg"),
-        "surface_win_pct": _stat(sb, "surface_win_pct"),
-        "rolling_ace_avg": _stat(sb, "rolling_ace_avg"),
-        "rolling_minutes_avg": _stat(sb, "rolling_minutes_avg"),
-        "rolling_bp_save": _stat(sb, "rolling_bp_save"),
-    }
-
-    def _last5(s):
-        out = []
-        for i in range(1, 6):
-            v = s.get(f"last5_{i}", None)
-            if v is None or (isinstance(v, float) and pd.isna(v)) or v == "":
-                out.append(None)
-            else:
-                try:
-                    # CSV may have 0.0/1.0 (float) or "0"/"1" (str)
-                    out.append(int(float(v)))
-                except (TypeError, ValueError):
-                    out.append(None)
-        return out
-
-    last5_a = _last5(sa)
-    last5_b = _last5(sb)
-    last_played_a = _format_last_played(sa.get("date"))
-    last_played_b = _format_last_played(sb.get("date"))
-
     return {
         "prob_a_wins": round(prob_a_wins, 4),
         "prob_b_wins": round(1 - prob_a_wins, 4),
-        "stats_a": stats_a,
-        "stats_b": stats_b,
-        "last5_a": last5_a,
-        "last5_b": last5_b,
-        "last_played_a": last_played_a,
-        "last_played_b": last_played_b,
+        "stats_a": pa["stats"],
+        "stats_b": pb["stats"],
+        "last5_a": pa["last5"],
+        "last5_b": pb["last5"],
+        "last_played_a": pa["last_played"],
+        "last_played_b": pb["last_played"],
     }
@@ -8,39 +8,47 @@ import pandas as pd
 
 from analytics.config import ROLL_WINDOW, LAST_N_WIN_AVG, ELO_K, ELO_INIT, ELO_SCALE
 
+# Rolling feature -> per-match source column, all averaged over ROLL_WINDOW prior matches.
+_ROLLING_SOURCES = {
+    "rolling_win_pct": "won",
+    "rolling_ace_avg": "ace",
+    "rolling_minutes_avg": "minutes",
+    "rolling_bp_save": "bp_save_pct",
+}
+
 
 def build_player_history(matches: pd.DataFrame) -> pd.DataFrame:
     """
     One row per player per match: date, player, opponent, surface, rank, won, ace, minutes, bpSaved, bpFaced.
     Sorted by (player, date).
     """
-    rows = []
-    for _, row in matches.iterrows():
-        rows.append({
-            "date": row["tourney_date"],
-            "player": row["winner_name"],
-            "opponent": row["loser_name"],
-            "surface": row["surface"],
-            "rank": row["winner_rank"],
-            "won": 1,
-            "ace": row["w_ace"],
-            "minutes": row["minutes"],
-            "bpSaved": row["w_bpSaved"],
-            "bpFaced": row["w_bpFaced"],
-        })
-        rows.append({
-            "date": row["tourney_date"],
-            "player": row["loser_name"],
-            "opponent": row["winner_name"],
-            "surface": row["surface"],
-            "rank": row["loser_rank"],
-            "won": 0,
-            "ace": row["l_ace"],
-            "minutes": row["minutes"],
-            "bpSaved": row["l_bpSaved"],
-            "bpFaced": row["l_bpFaced"],
-        })
-    df = pd.DataFrame(rows)
+    # Winner and loser views share the match index; a stable index sort interleaves them
+    # back into match order so same-date ties keep their original sequence per player.
+    winners = pd.DataFrame({
+        "date": matches["tourney_date"],
+        "player": matches["winner_name"],
+        "opponent": matches["loser_name"],
+        "surface": matches["surface"],
+        "rank": matches["winner_rank"],
+        "won": 1,
+        "ace": matches["w_ace"],
+        "minutes": matches["minutes"],
+        "bpSaved": matches["w_bpSaved"],
+        "bpFaced": matches["w_bpFaced"],
+    })
+    losers = pd.DataFrame({
+        "date": matches["tourney_date"],
+        "player": matches["loser_name"],
+        "opponent": matches["winner_name"],
+        "surface": matches["surface"],
+        "rank": matches["loser_rank"],
+        "won": 0,
+        "ace": matches["l_ace"],
+        "minutes": matches["minutes"],
+        "bpSaved": matches["l_bpSaved"],
+        "bpFaced": matches["l_bpFaced"],
+    })
+    df = pd.concat([winners, losers]).sort_index(kind="stable")
     return df.sort_values(["player", "date"]).reset_index(drop=True)
 
 
@@ -55,21 +63,37 @@ def add_elo(
 
     If return_final_elo is True, returns (player_hist, current_elo_dict).
     """
-    elo: dict[str, float] = {}
-    elo_rows = []
+    n = len(matches)
+    winners = matches["winner_name"].to_numpy()
+    losers = matches["loser_name"].to_numpy()
+    # Integer player codes (winners = codes[:n], losers = codes[n:]); ratings indexed by code.
+    codes, names = pd.factorize(np.concatenate([winners, losers]), use_na_sentinel=False)
+    ratings = [ELO_INIT] * len(names)
+    # Column arrays, interleaved per match (winner at 2i, loser at 2i + 1).
+    players = np.empty(2 * n, dtype=object)
+    players[0::2] = winners
+    players[1::2] = losers
+    elo_before = np.empty(2 * n, dtype=np.float64)
 
-    for _, row in matches.iterrows():
-        date = row["tourney_date"]
-        w, l = row["winner_name"], row["loser_name"]
-        r_w = elo.get(w, ELO_INIT)
-        r_l = elo.get(l, ELO_INIT)
-        elo_rows.append({"date": date, "player": w, "elo_before": r_w})
-        elo_rows.append({"date": date, "player": l, "elo_before": r_l})
-        e_w = 1.0 / (1.0 + 10.0 ** ((r_l - r_w) / ELO_SCALE))
-        elo[w] = r_w + ELO_K * (1.0 - e_w)
-        elo[l] = r_l + ELO_K * (0.0 - (1.0 - e_w))
+    # Bind constants locally; the loop runs once per match.
+    k, scale = ELO_K, ELO_SCALE
+    for i, (w, l) in enumerate(zip(codes[:n].tolist(), codes[n:].tolist())):
+        r_w = ratings[w]
+        r_l = ratings[l]
+        elo_before[2 * i] = r_w
+        elo_before[2 * i + 1] = r_l
+        e_w = 1.0 / (1.0 + 10.0 ** ((r_l - r_w) / scale))
+        # Zero-sum update: the loser gives up exactly what the winner gains.
+        delta = k * (1.0 - e_w)
+        ratings[w] = r_w + delta
+        ratings[l] = r_l - delta
+    elo: dict[str, float] = dict(zip(names, ratings))
 
-    elo_df = pd.DataFrame(elo_rows).drop_duplicates(subset=["date", "player"])
+    elo_df = pd.DataFrame({
+        "date": np.repeat(matches["tourney_date"].to_numpy(), 2),
+        "player": players,
+        "elo_before": elo_before,
+    }).drop_duplicates(subset=["date", "player"])
     out = player_hist.merge(elo_df, on=["date", "player"], how="left")
     out["elo_before"] = out["elo_before"].fillna(ELO_INIT)
     if return_final_elo:
@@ -82,36 +106,35 @@ def add_rolling_features(player_hist: pd.DataFrame) -> pd.DataFrame:
     Add rolling_win_pct, last3_win_avg, surface_win_pct, rolling_ace_avg,
     rolling_minutes_avg, bp_save_pct, rolling_bp_save. All point-in-time (shift).
     """
-    out = player_hist.copy()
-
-    out["rolling_win_pct"] = (
-        out.groupby("player")["won"]
-        .transform(lambda x: x.shift().rolling(ROLL_WINDOW, min_periods=1).mean())
-    )
-    out["last3_win_avg"] = (
-        out.groupby("player")["won"]
-        .transform(lambda x: x.shift().rolling(LAST_N_WIN_AVG, min_periods=1).mean())
-    )
-    # Same as nested groupby(player).apply(groupby(surface)) but avoids pandas apply FutureWarning.
-    out["surface_win_pct"] = out.groupby(["player", "surface"], sort=False)["won"].transform(
-        lambda x: x.shift().rolling(ROLL_WINDOW, min_periods=1).mean()
-    )
-    out["rolling_ace_avg"] = (
-        out.groupby("player")["ace"]
-        .transform(lambda x: x.shift().rolling(ROLL_WINDOW, min_periods=1).mean())
-    )
-    out["rolling_minutes_avg"] = (
-        out.groupby("player")["minutes"]
-        .transform(lambda x: x.shift().rolling(ROLL_WINDOW, min_periods=1).mean())
-    )
+    # Only new columns are added, so a shallow copy keeps the caller's frame untouched
+    # without duplicating every existing column.
+    out = player_hist.copy(deep=False)
     out["bp_save_pct"] = np.where(
         out["bpFaced"] > 0,
         out["bpSaved"] / out["bpFaced"],
         np.nan,
     )
-    out["rolling_bp_save"] = (
-        out.groupby("player")["bp_save_pct"]
-        .transform(lambda x: x.shift().rolling(ROLL_WINDOW, min_periods=1).mean())
+
+    # Shift once per player so every window only sees prior matches, then roll all
+    # columns in a single grouped pass instead of one Python lambda per group per stat.
+    prev = out.groupby("player", sort=False)[list(_ROLLING_SOURCES.values())].shift()
+    prev_by_player = prev.groupby(out["player"], sort=False)
+    rolled = (
+        prev_by_player.rolling(ROLL_WINDOW, min_periods=1).mean()
+        .reset_index(level=0, drop=True)
+    )
+    for feature, source in _ROLLING_SOURCES.items():
+        out[feature] = rolled[source]
+    out["last3_win_avg"] = (
+        prev_by_player["won"].rolling(LAST_N_WIN_AVG, min_periods=1).mean()
+        .reset_index(level=0, drop=True)
+    )
+    # Same as nested groupby(player).apply(groupby(surface)) but avoids pandas apply FutureWarning.
+    prev_surface = out.groupby(["player", "surface"], sort=False, observed=True)["won"].shift()
+    out["surface_win_pct"] = (
+        prev_surface.groupby([out["player"], out["surface"]], sort=False, observed=True)
+        .rolling(ROLL_WINDOW, min_periods=1).mean()
+        .reset_index(level=[0, 1], drop=True)
     )
     return out
 
@@ -3,14 +3,25 @@ Load historical match data from TennisMyLife (stats.tennismylife.org).
 
 Returns a single DataFrame of all matches, sorted by tourney_date.
 """
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 import pandas as pd
+import requests
 
 from analytics.config import (
     get_tennismylife_year_url,
     TENNISMYLIFE_YEARS,
     TENNISMYLIFE_CURRENT_TOURNEYS_URL,
+    DATA_RAW_DIR,
 )
 
+logger = logging.getLogger(__name__)
+
+_ROOT = Path(__file__).resolve().parent.parent
+
 # Yearly + ongoing CSVs sometimes ship these as strings or blanks; coerce for math/ops downstream.
 _NUMERIC_MATCH_COLS = (
     "winner_rank",
@@ -24,10 +35,76 @@ _NUMERIC_MATCH_COLS = (
     "l_bpFaced",
 )
 
+# Low-cardinality labels; category dtype makes equality/groupby on them integer-code ops.
+_CATEGORICAL_MATCH_COLS = (
+    "surface",
+    "tourney_level",
+    "round",
+)
+
+# Columns kept from the ~50 in each CSV: match identity plus what features/training use.
+# Missing ones are simply absent (usecols callable), e.g. in the ongoing-tourneys file.
+_MATCH_COLS = frozenset(
+    ("tourney_id", "tourney_name", "tourney_date", "winner_name", "loser_name", "score")
+    + _NUMERIC_MATCH_COLS
+    + _CATEGORICAL_MATCH_COLS
+)
+
+# Read tourney_date (YYYYMMDD) as text so it parses directly, without an int -> str pass.
+_READ_DTYPES = {"tourney_date": str}
+
+# Year CSVs + ongoing is a handful of files; one thread each is plenty.
+_MAX_DOWNLOAD_WORKERS = 8
+_DOWNLOAD_TIMEOUT_S = 60
+
+
+def _fetch_csv(url: str, cache_dir: Path) -> Path:
+    """
+    Download url into cache_dir and return the local path.
+
+    Revalidates an existing copy with ETag / Last-Modified (kept in a .http.json
+    sidecar), so unchanged files (past years) cost a 304 instead of a full transfer.
+    """
+    path = cache_dir / url.rsplit("/", 1)[-1]
+    meta_path = path.with_name(path.name + ".http.json")
+    headers = {}
+    if path.exists() and meta_path.exists():
+        meta = json.loads(meta_path.read_text())
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    resp = requests.get(url, headers=headers, timeout=_DOWNLOAD_TIMEOUT_S)
+    if resp.status_code == 304:
+        return path
+    resp.raise_for_status()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # Write-then-rename so an interrupted download never sits behind a valid ETag.
+    tmp = path.with_name(path.name + ".part")
+    tmp.write_bytes(resp.content)
+    tmp.replace(path)
+    meta_path.write_text(json.dumps({
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+    }))
+    return path
+
+
+def _read_source(label: str, url: str, cache_dir: Path) -> pd.DataFrame | None:
+    """Read one source CSV; None (after logging why) if it cannot be loaded."""
+    try:
+        path = _fetch_csv(url, cache_dir)
+        return pd.read_csv(path, usecols=lambda col: col in _MATCH_COLS, dtype=_READ_DTYPES)
+    except Exception as e:
+        logger.warning("Skip %s: %s", label, e)
+        return None
+
 
 def load_historical_matches(
     years: list[int] | None = None,
     include_ongoing: bool = True,
+    cache_dir: str | Path | None = None,
 ) -> pd.DataFrame:
     """
     Load and concatenate year CSVs (and optionally ongoing tourneys) into one DataFrame.
@@ -35,29 +112,32 @@ def load_historical_matches(
     Args:
         years: List of years to load (default: TENNISMYLIFE_YEARS from config).
         include_ongoing: If True, append ongoing_tourneys.csv (in-progress tournaments).
+        cache_dir: Where downloaded CSVs are kept and revalidated
+            (default: DATA_RAW_DIR under project root).
 
     Returns:
-        DataFrame with columns including tourney_date, winner_name, loser_name,
-        surface, winner_rank, loser_rank, minutes, w_ace, l_ace, w_bpSaved, etc.
-        tourney_date is datetime. Sorted by tourney_date.
+        DataFrame with the _MATCH_COLS present in the source: tourney_id/name/date,
+        winner_name, loser_name, surface, tourney_level, round, score, ranks, minutes,
+        aces and break-point saved/faced.
+        tourney_date is datetime; surface (and tourney_level/round when present) are
+        categorical. Sorted by tourney_date.
     """
     years = years or TENNISMYLIFE_YEARS
-    frames = []
-
-    for year in years:
-        url = get_tennismylife_year_url(year)
-        try:
-            df = pd.read_csv(url)
-            frames.append(df)
-        except Exception as e:
-            print(f"Skip {year}: {e}")
-
+    cache_dir = Path(cache_dir or _ROOT / DATA_RAW_DIR)
+    labels = [str(year) for year in years]
+    urls = [get_tennismylife_year_url(year) for year in years]
     if include_ongoing:
-        try:
-            ongoing = pd.read_csv(TENNISMYLIFE_CURRENT_TOURNEYS_URL)
-            frames.append(ongoing)
-        except Exception as e:
-            print(f"Skip ongoing tourneys: {e}")
+        labels.append("ongoing tourneys")
+        urls.append(TENNISMYLIFE_CURRENT_TOURNEYS_URL)
+
+    # Downloads are network-bound: fetch concurrently. map() keeps source order,
+    # which the stable date sort below relies on for same-date rows.
+    with ThreadPoolExecutor(max_workers=min(len(urls), _MAX_DOWNLOAD_WORKERS) or 1) as pool:
+        frames = [
+            df
+            for df in pool.map(_read_source, labels, urls, [cache_dir] * len(urls))
+            if df is not None
+        ]
 
     if not frames:
         return pd.DataFrame()
@@ -66,9 +146,14 @@ def load_historical_matches(
     for col in _NUMERIC_MATCH_COLS:
         if col in out.columns:
             out[col] = pd.to_numeric(out[col], errors="coerce")
+    for col in _CATEGORICAL_MATCH_COLS:
+        if col in out.columns:
+            out[col] = out[col].astype("category")
     out["tourney_date"] = pd.to_datetime(
-        out["tourney_date"].astype(str), format="%Y%m%d", errors="coerce"
+        out["tourney_date"], format="%Y%m%d", errors="coerce"
     )
     out = out.dropna(subset=["tourney_date"])
-    out = out.sort_values("tourney_date").reset_index(drop=True)
+    # Sort once, stably: tourney_date is per tournament, so source row order is the only
+    # within-event order. Downstream steps (ELO sweep, player history) rely on it and never re-sort.
+    out = out.sort_values("tourney_date", kind="stable").reset_index(drop=True)
     return out
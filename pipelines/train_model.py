@@ -4,10 +4,10 @@ Daily train pipeline: ingest -> player features (ELO, rolling) -> match matrix -
 Run from repo root:  python pipelines/train_model.py   or   python -m pipelines.train_model
 """
 import json
+import logging
 import sys
 from pathlib import Path
 
-import numpy as np
 import pandas as pd
 import joblib
 from xgboost import XGBClassifier
@@ -41,55 +41,61 @@ from pipelines.features import (
     add_rolling_features,
 )
 
+logger = logging.getLogger(__name__)
+
+
+# Match-level diff feature -> player_hist column it is computed from (winner minus loser).
+_DIFF_FEATURES = {
+    "elo_diff": "elo_before",
+    "form_diff": "rolling_win_pct",
+    "last3_win_diff": "last3_win_avg",
+    "surface_win_diff": "surface_win_pct",
+    "ace_diff": "rolling_ace_avg",
+    "minutes_diff": "rolling_minutes_avg",
+    "bp_diff": "rolling_bp_save",
+}
+
 
 def _build_match_matrix(matches: pd.DataFrame, player_hist: pd.DataFrame) -> pd.DataFrame:
     """Build match-level feature matrix (diffs) from player_hist lookups."""
-    match_rows = []
-    for _, row in matches.iterrows():
-        date, surface = row["tourney_date"], row["surface"]
-        w, l = row["winner_name"], row["loser_name"]
-        w_hist = player_hist[(player_hist["player"] == w) & (player_hist["date"] == date)]
-        l_hist = player_hist[(player_hist["player"] == l) & (player_hist["date"] == date)]
-        if w_hist.empty or l_hist.empty:
-            continue
-        w_stats, l_stats = w_hist.iloc[0], l_hist.iloc[0]
-        rank_diff_w = (
-            (row["loser_rank"] - row["winner_rank"])
-            if pd.notna(row["winner_rank"]) and pd.notna(row["loser_rank"])
-            else np.nan
-        )
-        match_rows.append({
-            "date": date,
-            "surface": surface,
-            "rank_diff": rank_diff_w,
-            "elo_diff": w_stats["elo_before"] - l_stats["elo_before"],
-            "form_diff": w_stats["rolling_win_pct"] - l_stats["rolling_win_pct"],
-            "last3_win_diff": w_stats["last3_win_avg"] - l_stats["last3_win_avg"],
-            "surface_win_diff": w_stats["surface_win_pct"] - l_stats["surface_win_pct"],
-            "ace_diff": w_stats["rolling_ace_avg"] - l_stats["rolling_ace_avg"],
-            "minutes_diff": w_stats["rolling_minutes_avg"] - l_stats["rolling_minutes_avg"],
-            "bp_diff": w_stats["rolling_bp_save"] - l_stats["rolling_bp_save"],
-            "target": 1,
-        })
-        rank_diff_l = (
-            (row["winner_rank"] - row["loser_rank"])
-            if pd.notna(row["winner_rank"]) and pd.notna(row["loser_rank"])
-            else np.nan
+    # Index player_hist by (player, date) once; keeping the first row per key matches the
+    # old per-match boolean scan + iloc[0]. Matches missing either player are skipped.
+    hist = (
+        player_hist.dropna(subset=["player"])
+        .drop_duplicates(subset=["player", "date"])
+        .set_index(["player", "date"])[list(_DIFF_FEATURES.values())]
+    )
+    w_key = pd.MultiIndex.from_arrays([matches["winner_name"], matches["tourney_date"]])
+    l_key = pd.MultiIndex.from_arrays([matches["loser_name"], matches["tourney_date"]])
+    found = w_key.isin(hist.index) & l_key.isin(hist.index)
+
+    found_matches = matches[found]
+    w_stats = hist.reindex(w_key[found]).to_numpy()
+    l_stats = hist.reindex(l_key[found]).to_numpy()
+    diffs = w_stats - l_stats
+    # NaN rank on either side propagates to NaN, as before.
+    rank_diff = (found_matches["loser_rank"] - found_matches["winner_rank"]).to_numpy()
+
+    def _rows(sign: int, target: int) -> pd.DataFrame:
+        frame = pd.DataFrame(
+            {
+                "date": found_matches["tourney_date"].to_numpy(),
+                "surface": found_matches["surface"].to_numpy(),
+                "rank_diff": sign * rank_diff,
+            },
+            index=found_matches.index,
         )
-        match_rows.append({
-            "date": date,
-            "surface": surface,
-            "rank_diff": rank_diff_l,
-            "elo_diff": l_stats["elo_before"] - w_stats["elo_before"],
-            "form_diff": l_stats["rolling_win_pct"] - w_stats["rolling_win_pct"],
-            "last3_win_diff": l_stats["last3_win_avg"] - w_stats["last3_win_avg"],
-            "surface_win_diff": l_stats["surface_win_pct"] - w_stats["surface_win_pct"],
-            "ace_diff": l_stats["rolling_ace_avg"] - w_stats["rolling_ace_avg"],
-            "minutes_diff": l_stats["rolling_minutes_avg"] - w_stats["rolling_minutes_avg"],
-            "bp_diff": l_stats["rolling_bp_save"] - w_stats["rolling_bp_save"],
-            "target": 0,
-        })
-    return pd.DataFrame(match_rows)
+        for i, name in enumerate(_DIFF_FEATURES):
+            frame[name] = sign * diffs[:, i]
+        frame["target"] = target
+        return frame
+
+    # Interleave winner/loser rows back into match order, one pair per match.
+    return (
+        pd.concat([_rows(1, 1), _rows(-1, 0)])
+        .sort_index(kind="stable")
+        .reset_index(drop=True)
+    )
 
 
 def run(
@@ -118,7 +124,7 @@ def run(
     matches = load_historical_matches(years=years, include_ongoing=include_ongoing)
     if matches.empty:
         raise RuntimeError("No match data loaded.")
-    print(f"Loaded {len(matches)} matches.")
+    logger.info("Loaded %d matches.", len(matches))
 
     # 2. Player history + ELO + rolling features
     player_hist = build_player_history(matches)
@@ -130,16 +136,22 @@ def run(
     model_df = pd.get_dummies(model_df, columns=["surface"], drop_first=True)
     model_df = model_df.fillna(0)
     feature_cols = [c for c in model_df.columns if c not in ("target", "date")]
-    print(f"Feature matrix: {model_df.shape}, features: {feature_cols}")
+    logger.info("Feature matrix: %s, features: %s", model_df.shape, feature_cols)
 
     # 4. Time split (from config unless overridden)
     q_train = train_frac
     q_val = train_frac + val_frac
+    # Rows follow match order, which ingest sorts by date; cut with binary search
+    # instead of three full-column masks (re-sort only if a caller broke the order).
+    if not model_df["date"].is_monotonic_increasing:
+        model_df = model_df.sort_values("date", kind="stable").reset_index(drop=True)
     train_end = model_df["date"].quantile(q_train)
     val_end = model_df["date"].quantile(q_val)
-    train_df = model_df[model_df["date"] <= train_end]
-    val_df = model_df[(model_df["date"] > train_end) & (model_df["date"] <= val_end)]
-    test_df = model_df[model_df["date"] > val_end]
+    i_train = model_df["date"].searchsorted(train_end, side="right")
+    i_val = model_df["date"].searchsorted(val_end, side="right")
+    train_df = model_df.iloc[:i_train]
+    val_df = model_df.iloc[i_train:i_val]
+    test_df = model_df.iloc[i_val:]
 
     X_train = train_df[feature_cols]
     y_train = train_df["target"]
@@ -147,7 +159,7 @@ def run(
     y_val = val_df["target"]
     X_test = test_df[feature_cols]
     y_test = test_df["target"]
-    print(f"Train {len(train_df)} / Val {len(val_df)} / Test {len(test_df)}")
+    logger.info("Train %d / Val %d / Test %d", len(train_df), len(val_df), len(test_df))
 
     # 5. Train (XGBoost params from config)
     clf = XGBClassifier(
@@ -167,17 +179,18 @@ def run(
 
     preds = clf.predict(X_test)
     probs = clf.predict_proba(X_test)[:, 1]
-    print("Test Accuracy:", accuracy_score(y_test, preds))
-    print("Test ROC AUC:", roc_auc_score(y_test, probs))
-    print("Test Log Loss:", log_loss(y_test, probs))
+    logger.info("Test Accuracy: %s", accuracy_score(y_test, preds))
+    logger.info("Test ROC AUC: %s", roc_auc_score(y_test, probs))
+    logger.info("Test Log Loss: %s", log_loss(y_test, probs))
 
     # 6. Save artifacts (filenames from config)
     joblib.dump(clf, out_dir / MODEL_FILENAME)
     with open(out_dir / FEATURE_COLS_FILENAME, "w") as f:
         json.dump(feature_cols, f, indent=2)
 
-    # Latest stats per player (last row per player + current ELO)
-    last = player_hist.sort_values("date").groupby("player").last().reset_index()
+    # Latest stats per player (last row per player + current ELO).
+    # player_hist is already sorted by (player, date), so no re-sort before the reduction.
+    last = player_hist.groupby("player").last().reset_index()
     last = last[
         [
             "player", "date", "elo_before", "rolling_win_pct", "last3_win_avg",
@@ -187,27 +200,23 @@ def run(
     last["current_elo"] = last["player"].map(current_elo).fillna(ELO_INIT)
 
     # Last 5 match results per player (1=win, 0=loss), most recent first: last5_1 .. last5_5
-    last5_rows = []
-    for player in player_hist["player"].unique():
-        group = (
-            player_hist[player_hist["player"] == player]
-            .sort_values("date", ascending=False)
-            .head(5)
-        )
-        wins = group["won"].tolist()
-        while len(wins) < 5:
-            wins.append(np.nan)
-        last5_rows.append({
-            "player": player,
-            "last5_1": wins[0], "last5_2": wins[1], "last5_3": wins[2],
-            "last5_4": wins[3], "last5_5": wins[4],
-        })
-    last5_df = pd.DataFrame(last5_rows)
+    # player_hist is sorted by (player, date) and keeps match order within a date (stable
+    # ingest sort), so counting from the end gives true recency: last5_1 is the latest round.
+    recency = player_hist.groupby("player", sort=False).cumcount(ascending=False)
+    last5_df = (
+        player_hist.loc[recency < 5, ["player", "won"]]
+        .assign(slot=recency)
+        .pivot(index="player", columns="slot", values="won")
+        .reindex(columns=range(5))
+    )
+    last5_df.columns = [f"last5_{i}" for i in range(1, 6)]
+    last5_df = last5_df.reset_index()
     last = last.merge(last5_df, on="player", how="left")
 
     last.to_csv(out_dir / PLAYER_STATS_FILENAME, index=False)
-    print(f"Saved model, feature_cols, and player_stats_latest to {out_dir}")
+    logger.info("Saved model, feature_cols, and player_stats_latest to %s", out_dir)
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
     run()
@@ -0,0 +1,72 @@
+"""
+Regression check: vectorized rolling features match the per-group shift().rolling().mean() reference.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics.config import ROLL_WINDOW, LAST_N_WIN_AVG, ELO_INIT
+from pipelines.features import build_player_history, add_elo, add_rolling_features
+
+
+def _toy_matches(seed: int, categorical_surface: bool) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    players = ["A", "B", "C", "D", "E"]
+    n = 60  # > ROLL_WINDOW matches per player on average
+    rows = []
+    for i in range(n):
+        w, l = rng.choice(players, size=2, replace=False)
+        faced = rng.integers(0, 6, size=2)
+        rows.append({
+            # Several matches share a tourney_date, like rounds of one event
+            "tourney_date": pd.Timestamp("2024-01-01") + pd.Timedelta(days=7 * (i // 4)),
+            "winner_name": w,
+            "loser_name": l,
+            "surface": rng.choice(["Hard", "Clay", "Grass"]),
+            "winner_rank": rng.integers(1, 200),
+            "loser_rank": rng.integers(1, 200),
+            "minutes": rng.choice([np.nan, 90.0, 120.0, 150.0]),
+            "w_ace": rng.integers(0, 15),
+            "l_ace": rng.integers(0, 15),
+            "w_bpSaved": rng.integers(0, faced[0] + 1),
+            "l_bpSaved": rng.integers(0, faced[1] + 1),
+            "w_bpFaced": faced[0],
+            "l_bpFaced": faced[1],
+        })
+    matches = pd.DataFrame(rows)
+    if categorical_surface:
+        matches["surface"] = matches["surface"].astype("category")
+    return matches
+
+
+def _reference_rolling(hist: pd.DataFrame, keys, col: str, window: int) -> pd.Series:
+    return hist.groupby(keys, observed=True)[col].transform(
+        lambda s: s.shift().rolling(window, min_periods=1).mean()
+    )
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("categorical_surface", [False, True])
+def test_rolling_features_match_per_group_reference(seed, categorical_surface):
+    matches = _toy_matches(seed, categorical_surface)
+    hist = build_player_history(matches)
+    hist = add_elo(hist, matches)
+    out = add_rolling_features(hist)
+
+    assert len(out) == 2 * len(matches)
+    assert out["elo_before"].notna().all()
+    assert (out.groupby("player")["elo_before"].first() == ELO_INIT).all()
+
+    ref = out.copy()
+    expected = {
+        "rolling_win_pct": _reference_rolling(ref, "player", "won", ROLL_WINDOW),
+        "rolling_ace_avg": _reference_rolling(ref, "player", "ace", ROLL_WINDOW),
+        "rolling_minutes_avg": _reference_rolling(ref, "player", "minutes", ROLL_WINDOW),
+        "rolling_bp_save": _reference_rolling(ref, "player", "bp_save_pct", ROLL_WINDOW),
+        "last3_win_avg": _reference_rolling(ref, "player", "won", LAST_N_WIN_AVG),
+        "surface_win_pct": _reference_rolling(ref, ["player", "surface"], "won", ROLL_WINDOW),
+    }
+    for feature, values in expected.items():
+        pd.testing.assert_series_equal(
+            out[feature].astype(float), values.astype(float), check_names=False, obj=feature
+        )